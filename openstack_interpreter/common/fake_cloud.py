@@ -0,0 +1,604 @@
+"""
+An offline stand-in for an OpenStack cloud.
+
+This serves a synthetic cloud from memory behind a real keystoneauth
+session, so the interpreter, the python clients, the SDK and the helpers
+built on top of them can all be used with no cloud at all. It is meant for
+trying things out, and for measuring the performance of the interpreter's
+own code, see:
+In [1]: from openstack_interpreter.v1 import benchmark
+In [2]: benchmark?
+
+Example use:
+In [1]: cloud = FakeCloud(regions=2, servers=1000, latency=0.01)
+In [2]: oi = cloud.interpreter()
+In [3]: servers = list(oi.sdk.connection.compute.servers())
+In [4]: cloud.stats
+"""
+
+from collections import Counter
+from datetime import datetime
+from datetime import timedelta
+import json
+import random
+import threading
+import time
+import uuid
+
+from keystoneauth1.identity import v3
+from keystoneauth1 import session as ks_session
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+try:
+    from urllib import parse as urlparse
+except ImportError:
+    # python 2
+    import urlparse
+
+
+FAKE_HOST = 'fake-cloud.local'
+FAKE_URL = 'http://%s' % FAKE_HOST
+AUTH_URL = FAKE_URL + '/identity/v3'
+
+# the largest page any list call will return, as with nova's max_limit
+MAX_LIMIT = 1000
+
+SERVER_STATUSES = ['ACTIVE'] * 8 + ['SHUTOFF', 'ERROR']
+VOLUME_STATUSES = ['in-use'] * 6 + ['available'] * 3 + ['error']
+RESOURCE_STATUSES = ['CREATE_COMPLETE'] * 9 + ['CREATE_FAILED']
+
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+def _version(version_id, href, status='CURRENT', **extra):
+    version = {
+        'id': version_id, 'status': status,
+        'links': [{'rel': 'self', 'href': href}],
+    }
+    version.update(extra)
+    return version
+
+
+class FakeCloud(object):
+    """
+    A synthetic cloud with the given number of regions and resources.
+
+    Compute, network, volume, image and identity are served, enough to
+    list, show and page through servers, flavors, ports, networks,
+    volumes, images, projects and regions. Metering serves samples for
+    every server for any meter and time range, and orchestration serves
+    the resources of a tree of nested stacks. Resources are randomly
+    generated but deterministic for a given seed.
+
+    :param regions: number of regions, named RegionOne, Region2, ...
+    :param servers: number of servers in each region
+    :param ports: number of ports in each region, defaults to one per server
+    :param volumes: number of volumes in each region, defaults to servers
+    :param flavors: number of flavors in each region
+    :param images: number of images in each region
+    :param projects: number of projects the resources are spread over
+    :param stacks: number of top level heat stacks in each region
+    :param stack_resources: number of resources in each stack
+    :param nested_stacks: number of those resources that are themselves
+        nested stacks, down to stack_depth levels deep
+    :param stack_depth: how many levels of nested stacks there are
+    :param sample_interval: seconds between the metering samples for
+        each server
+    :param latency: seconds every request takes, or a (min, max) tuple
+    :param error_rate: fraction of requests that fail with error_status
+    :param error_status: status code for injected errors, e.g. 429 or 503
+    :param retry_after: Retry-After header value for injected errors
+    :param seed: random seed for generating the cloud and injecting errors
+
+    fields:
+      - stats
+          Counter of requests served per (region, service, method).
+      - errors
+          Counter of errors injected per (region, service).
+    """
+
+    def __init__(self, regions=1, servers=100, ports=None, volumes=None,
+                 flavors=10, images=10, projects=10, stacks=1,
+                 stack_resources=10, nested_stacks=2, stack_depth=3,
+                 sample_interval=600, latency=0.0, error_rate=0.0,
+                 error_status=503, retry_after=None, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.sample_interval = sample_interval
+        self.stats = Counter()
+        self.errors = Counter()
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+        self.regions = ['RegionOne'] + [
+            'Region%s' % i for i in range(2, regions + 1)]
+        self.projects = [
+            {'id': self._uuid(hex=True), 'name': 'project-%s' % i,
+             'domain_id': 'default', 'enabled': True,
+             'description': '', 'is_domain': False, 'parent_id': 'default'}
+            for i in range(projects)]
+        self.admin_project = self.projects[0]
+        self.user_id = self._uuid(hex=True)
+
+        self.resources = {}
+        for region in self.regions:
+            self.resources[region] = self._generate_region(
+                servers,
+                servers if ports is None else ports,
+                servers if volumes is None else volumes,
+                flavors, images)
+            self.resources[region]['stacks'] = self._generate_stacks(
+                region, stacks, stack_resources, nested_stacks, stack_depth)
+
+    def _uuid(self, hex=False):
+        value = uuid.UUID(int=self._random.getrandbits(128), version=4)
+        return value.hex if hex else str(value)
+
+    def _project_id(self):
+        return self._random.choice(self.projects)['id']
+
+    def _generate_region(self, servers, ports, volumes, flavors, images):
+        timestamp = '2018-01-01T00:00:00Z'
+        resources = {}
+        resources['flavors'] = [
+            {'id': self._uuid(), 'name': 'flavor-%s' % i,
+             'vcpus': 2 ** (i % 4), 'ram': 1024 * 2 ** (i % 6),
+             'disk': 10 * (i + 1), 'swap': '', 'rxtx_factor': 1.0,
+             'os-flavor-access:is_public': True,
+             'OS-FLV-EXT-DATA:ephemeral': 0, 'links': []}
+            for i in range(flavors)]
+        resources['images'] = [
+            {'id': self._uuid(), 'name': 'image-%s' % i,
+             'status': 'active', 'visibility': 'public',
+             'disk_format': 'qcow2', 'container_format': 'bare',
+             'size': self._random.randint(1, 10) * 1024 ** 3,
+             'min_disk': 0, 'min_ram': 0, 'owner': self._project_id(),
+             'created_at': timestamp, 'updated_at': timestamp, 'tags': []}
+            for i in range(images)]
+        resources['networks'] = [
+            {'id': self._uuid(), 'name': 'network-%s' % i,
+             'status': 'ACTIVE', 'admin_state_up': True,
+             'tenant_id': project['id'], 'project_id': project['id'],
+             'subnets': [], 'shared': False}
+            for i, project in enumerate(self.projects)]
+
+        resources['servers'] = []
+        for i in range(servers):
+            project_id = self._project_id()
+            resources['servers'].append({
+                'id': self._uuid(), 'name': 'server-%s' % i,
+                'status': self._random.choice(SERVER_STATUSES),
+                'tenant_id': project_id, 'user_id': self.user_id,
+                'flavor': {
+                    'id': self._random.choice(resources['flavors'])['id'],
+                    'links': []},
+                'image': {
+                    'id': self._random.choice(resources['images'])['id'],
+                    'links': []},
+                'addresses': {}, 'metadata': {}, 'links': [],
+                'created': timestamp, 'updated': timestamp,
+                'hostId': self._uuid(hex=True),
+                'OS-EXT-AZ:availability_zone': 'nova',
+            })
+
+        resources['ports'] = []
+        for i in range(ports):
+            server = resources['servers'][i % servers] if servers else {}
+            network = self._random.choice(resources['networks'])
+            resources['ports'].append({
+                'id': self._uuid(), 'name': '',
+                'status': 'ACTIVE', 'admin_state_up': True,
+                'network_id': network['id'],
+                'device_id': server.get('id', ''),
+                'device_owner': 'compute:nova' if server else '',
+                'tenant_id': server.get('tenant_id', network['tenant_id']),
+                'project_id': server.get(
+                    'tenant_id', network['tenant_id']),
+                'mac_address': 'fa:16:3e:%02x:%02x:%02x' % (
+                    i >> 16 & 255, i >> 8 & 255, i & 255),
+                'fixed_ips': [{'ip_address': '10.%s.%s.%s' % (
+                    i >> 16 & 255, i >> 8 & 255, i & 255)}],
+            })
+
+        resources['volumes'] = []
+        for i in range(volumes):
+            status = self._random.choice(VOLUME_STATUSES)
+            attachments = []
+            if status == 'in-use' and servers:
+                server = resources['servers'][i % servers]
+                attachments = [{'server_id': server['id'],
+                                'device': '/dev/vdb'}]
+            resources['volumes'].append({
+                'id': self._uuid(), 'name': 'volume-%s' % i,
+                'status': status, 'size': self._random.randint(1, 100),
+                'attachments': attachments, 'bootable': 'false',
+                'os-vol-tenant-attr:tenant_id': self._project_id(),
+                'volume_type': 'standard', 'availability_zone': 'nova',
+                'metadata': {}, 'links': [],
+                'created_at': timestamp, 'updated_at': timestamp,
+            })
+        return resources
+
+    def _generate_stacks(self, region, stacks, resources, nested, depth):
+        """Generate a tree of nested stacks for each top level stack.
+
+        Returns a dict of both stack name and id to each stack.
+        """
+        timestamp = datetime(2018, 1, 1)
+        base_url = '%s/%s/orchestration/v1/%s/stacks' % (
+            FAKE_URL, region, self.admin_project['id'])
+        by_name = {}
+
+        def add_stack(name, level):
+            stack = {'id': self._uuid(), 'stack_name': name,
+                     'resources': []}
+            by_name[name] = by_name[stack['id']] = stack
+            stack_url = '%s/%s/%s' % (base_url, name, stack['id'])
+            for i in range(resources):
+                is_stack = i < nested and level < depth
+                resource_name = 'resource-%s' % i
+                updated = timestamp + timedelta(
+                    seconds=self._random.randint(1, 600))
+                resource = {
+                    'resource_name': resource_name,
+                    'logical_resource_id': resource_name,
+                    'physical_resource_id': self._uuid(),
+                    'resource_type': (
+                        'OS::Heat::Stack' if is_stack else
+                        'OS::Nova::Server'),
+                    'resource_status': self._random.choice(
+                        RESOURCE_STATUSES),
+                    'resource_status_reason': 'state changed',
+                    'creation_time': timestamp.strftime(TIME_FORMAT),
+                    'updated_time': updated.strftime(TIME_FORMAT),
+                    'required_by': [],
+                    'links': [
+                        {'rel': 'self', 'href': '%s/resources/%s' % (
+                            stack_url, resource_name)},
+                        {'rel': 'stack', 'href': stack_url}],
+                }
+                if is_stack:
+                    nested_stack = add_stack(
+                        '%s-%s' % (name, resource_name), level + 1)
+                    resource['physical_resource_id'] = nested_stack['id']
+                    resource['links'].append({
+                        'rel': 'nested', 'href': '%s/%s/%s' % (
+                            base_url, nested_stack['stack_name'],
+                            nested_stack['id'])})
+                stack['resources'].append(resource)
+            return stack
+
+        for i in range(stacks):
+            add_stack('stack-%s' % i, 1)
+        return by_name
+
+    def _token(self):
+        catalog = []
+        for service_type, path in [
+                ('compute', 'compute/v2.1'), ('network', 'network'),
+                ('volumev2', 'volume/v2/%s' % self.admin_project['id']),
+                ('volumev3', 'volume/v3/%s' % self.admin_project['id']),
+                ('block-storage',
+                 'volume/v3/%s' % self.admin_project['id']),
+                ('image', 'image'), ('metering', 'metering'),
+                ('orchestration',
+                 'orchestration/v1/%s' % self.admin_project['id']),
+                ('identity', 'identity')]:
+            endpoints = []
+            for region in self.regions:
+                url = '%s/%s/%s' % (FAKE_URL, region, path)
+                if service_type == 'identity':
+                    url = '%s/identity' % FAKE_URL
+                for interface in ('public', 'internal', 'admin'):
+                    endpoints.append({
+                        'id': self._uuid(hex=True), 'interface': interface,
+                        'region': region, 'region_id': region, 'url': url})
+            catalog.append({
+                'id': self._uuid(hex=True), 'type': service_type,
+                'name': service_type, 'endpoints': endpoints})
+        return {'token': {
+            'methods': ['password'],
+            'expires_at': '2999-01-01T00:00:00.000000Z',
+            'issued_at': '2018-01-01T00:00:00.000000Z',
+            'user': {'id': self.user_id, 'name': 'admin',
+                     'domain': {'id': 'default', 'name': 'Default'}},
+            'project': {'id': self.admin_project['id'],
+                        'name': self.admin_project['name'],
+                        'domain': {'id': 'default', 'name': 'Default'}},
+            'roles': [{'id': self._uuid(hex=True), 'name': 'admin'}],
+            'catalog': catalog,
+        }}
+
+    def session(self):
+        """Get a keystoneauth session authenticated against this cloud."""
+        requests_session = requests.Session()
+        requests_session.mount(FAKE_URL, FakeCloudAdapter(self))
+        auth = v3.Password(
+            auth_url=AUTH_URL, username='admin', password='password',
+            project_name=self.admin_project['name'],
+            user_domain_id='default', project_domain_id='default')
+        return ks_session.Session(auth=auth, session=requests_session)
+
+    def interpreter(self, region=None):
+        """Get an OpenStackInterpreter setup against this cloud.
+
+        :param region: default region, defaults to RegionOne
+        """
+        # imported here as the interpreter imports all the clients
+        from openstack_interpreter.v1.interpreter import OpenStackInterpreter
+        return OpenStackInterpreter(
+            session=self.session(), default_region=region or self.regions[0])
+
+    def handle(self, method, url, body=None):
+        """Serve a request, returning (status, headers, body)."""
+        url = urlparse.urlparse(url)
+        path = [p for p in url.path.split('/') if p]
+        query = dict(urlparse.parse_qsl(url.query))
+
+        if path[:1] == ['identity']:
+            region, service, path = None, 'identity', path[1:]
+        elif len(path) >= 2 and path[0] in self.resources:
+            region, service, path = path[0], path[1], path[2:]
+        else:
+            return self._not_found()
+        handler = getattr(
+            self, '_handle_%s' % service.replace('-', '_'), None)
+        if handler is None:
+            return self._not_found()
+        if service == 'metering':
+            # ceilometer repeats q.field, q.op and q.value per filter
+            query = urlparse.parse_qs(url.query, keep_blank_values=True)
+
+        with self._lock:
+            self.stats[(region, service, method)] += 1
+            inject_error = (
+                self.error_rate and self._random.random() < self.error_rate)
+            if inject_error:
+                self.errors[(region, service)] += 1
+            latency = self.latency
+            if isinstance(latency, (list, tuple)):
+                latency = self._random.uniform(*latency)
+
+        if latency:
+            time.sleep(latency)
+
+        if inject_error:
+            headers = {}
+            if self.retry_after is not None:
+                headers['Retry-After'] = str(self.retry_after)
+            return self.error_status, headers, {'error': {
+                'code': self.error_status, 'message': 'Injected error.'}}
+
+        return handler(method, region, path, query, body)
+
+    def _not_found(self):
+        return 404, {}, {'error': {'code': 404, 'message': 'Not found.'}}
+
+    def _page(self, items, query, key, base_url, links_key=None):
+        """Page through items by marker and limit, as the APIs do."""
+        start = 0
+        marker = query.get('marker')
+        if marker:
+            for i, item in enumerate(items):
+                if item['id'] == marker:
+                    start = i + 1
+                    break
+        limit = min(int(query.get('limit', MAX_LIMIT)), MAX_LIMIT)
+        page = items[start:start + limit]
+        body = {key: page}
+        if start + limit < len(items):
+            next_query = dict(query, marker=page[-1]['id'], limit=limit)
+            next_url = '%s?%s' % (base_url, urlparse.urlencode(next_query))
+            if links_key:
+                body[links_key] = [{'rel': 'next', 'href': next_url}]
+            else:
+                body['next'] = next_url
+        return 200, {}, body
+
+    def _list_or_show(self, items, path, query, key, base_url,
+                      links_key=None, filters=()):
+        if len(path) == 1 or (len(path) == 2 and path[1] == 'detail'):
+            for field in filters:
+                if field in query:
+                    items = [i for i in items if i.get(field) == query[field]]
+            return self._page(items, query, key, base_url, links_key)
+        if len(path) == 2:
+            for item in items:
+                if item['id'] == path[1]:
+                    return 200, {}, {key.rstrip('s'): item}
+        return self._not_found()
+
+    def _handle_compute(self, method, region, path, query, body):
+        base_url = '%s/%s/compute/v2.1' % (FAKE_URL, region)
+        if not path:
+            return 200, {}, {'versions': [_version(
+                'v2.1', base_url + '/', version='2.79', min_version='2.1')]}
+        if path == ['v2.1']:
+            return 200, {}, {'version': _version(
+                'v2.1', base_url + '/', version='2.79', min_version='2.1')}
+        path = path[1:]
+        resources = self.resources[region]
+        if path and path[0] in ('servers', 'flavors') and method == 'GET':
+            return self._list_or_show(
+                resources[path[0]], path, query, path[0],
+                base_url + '/' + '/'.join(path), '%s_links' % path[0],
+                filters=('status', 'name'))
+        return self._not_found()
+
+    def _handle_network(self, method, region, path, query, body):
+        base_url = '%s/%s/network' % (FAKE_URL, region)
+        if not path:
+            return 200, {}, {'versions': [
+                _version('v2.0', base_url + '/v2.0/')]}
+        path = path[1:]
+        if path:
+            path[0] = path[0].replace('.json', '')
+        resources = self.resources[region]
+        if path and path[0] in ('ports', 'networks') and method == 'GET':
+            return self._list_or_show(
+                resources[path[0]], path, query, path[0],
+                base_url + '/v2.0/' + path[0], '%s_links' % path[0],
+                filters=('device_id', 'network_id', 'device_owner'))
+        return self._not_found()
+
+    def _handle_volume(self, method, region, path, query, body):
+        base_url = '%s/%s/volume' % (FAKE_URL, region)
+        if not path:
+            return 200, {}, {'versions': [
+                _version('v2.0', base_url + '/v2/', status='DEPRECATED'),
+                _version('v3.0', base_url + '/v3/', version='3.60',
+                         min_version='3.0')]}
+        base_url += '/' + '/'.join(path[:2])
+        path = path[2:]
+        resources = self.resources[region]
+        if path and path[0] == 'volumes' and method == 'GET':
+            return self._list_or_show(
+                resources['volumes'], path, query, 'volumes',
+                base_url + '/' + '/'.join(path), 'volumes_links',
+                filters=('status', 'name'))
+        return self._not_found()
+
+    def _handle_image(self, method, region, path, query, body):
+        base_url = '%s/%s/image' % (FAKE_URL, region)
+        if not path:
+            return 200, {}, {'versions': [
+                _version('v2.6', base_url + '/v2/')]}
+        path = path[1:]
+        resources = self.resources[region]
+        if path[:1] == ['schemas'] and method == 'GET':
+            # glanceclient validates images against these, so keep them
+            # as permissive as possible.
+            schema = {'name': 'image', 'properties': {},
+                      'additionalProperties': {}, 'links': []}
+            if path[1:] == ['images']:
+                schema = {'name': 'images', 'links': [], 'properties': {
+                    'images': {'type': 'array', 'items': schema}}}
+            return 200, {}, schema
+        if path and path[0] == 'images' and method == 'GET':
+            if len(path) == 2:
+                for image in resources['images']:
+                    if image['id'] == path[1]:
+                        return 200, {}, image
+                return self._not_found()
+            return self._page(
+                resources['images'], query, 'images', '/v2/images')
+        return self._not_found()
+
+    def _samples(self, region, meter, start, end, resource_id, limit):
+        """Generate up to limit samples per server between start and end.
+        """
+        interval = timedelta(seconds=self.sample_interval)
+        # samples are aligned to the interval, from the start of 2018
+        epoch = datetime(2018, 1, 1)
+        steps = max(int(-(-(start - epoch).total_seconds() //
+                          self.sample_interval)), 0)
+        servers = self.resources[region]['servers']
+        if resource_id is not None:
+            servers = [s for s in servers if s['id'] == resource_id]
+        samples = []
+        if not servers:
+            return samples
+        timestamp = epoch + interval * steps
+        while timestamp < end and len(samples) < limit:
+            for i, server in enumerate(servers):
+                if len(samples) >= limit:
+                    break
+                samples.append({
+                    'counter_name': meter, 'counter_type': 'gauge',
+                    'counter_unit': '%', 'resource_id': server['id'],
+                    'project_id': server['tenant_id'],
+                    'user_id': server['user_id'],
+                    'counter_volume': float((i * 37 + steps * 11) % 100),
+                    'timestamp': timestamp.strftime(TIME_FORMAT),
+                    'resource_metadata': {}, 'source': 'openstack',
+                })
+            timestamp += interval
+            steps += 1
+        return samples
+
+    def _handle_metering(self, method, region, path, query, body):
+        if path[:2] != ['v2', 'meters'] or len(path) != 3 or \
+                method != 'GET':
+            return self._not_found()
+        start, end = datetime.min, datetime.max
+        resource_id = None
+        for field, op, value in zip(
+                query.get('q.field', []), query.get('q.op', []),
+                query.get('q.value', [])):
+            if field == 'timestamp' and op in ('ge', 'gt'):
+                start = datetime.strptime(value[:19], TIME_FORMAT)
+            elif field == 'timestamp' and op in ('le', 'lt'):
+                end = datetime.strptime(value[:19], TIME_FORMAT)
+            elif field == 'resource_id' and op == 'eq':
+                resource_id = value
+        # ceilometer's own default limit
+        limit = int(query.get('limit', [100])[0])
+        return 200, {}, self._samples(
+            region, path[2], start, end, resource_id, limit)
+
+    def _handle_orchestration(self, method, region, path, query, body):
+        # path is v1/<project_id>/stacks/<name or id>[/<id>]/resources
+        path = path[2:]
+        if path[:1] != ['stacks'] or path[-1:] != ['resources'] or \
+                len(path) not in (3, 4) or method != 'GET':
+            return self._not_found()
+        stack = self.resources[region]['stacks'].get(path[1])
+        if stack is None or (len(path) == 4 and path[2] != stack['id']):
+            return self._not_found()
+        return 200, {}, {'resources': stack['resources']}
+
+    def _handle_identity(self, method, region, path, query, body):
+        base_url = '%s/identity' % FAKE_URL
+        if not path:
+            return 200, {}, {'versions': {'values': [
+                _version('v3.10', base_url + '/v3/', status='stable')]}}
+        if path == ['v3']:
+            return 200, {}, {'version': _version(
+                'v3.10', base_url + '/v3/', status='stable')}
+        path = path[1:]
+        if path == ['auth', 'tokens'] and method == 'POST':
+            return 201, {'X-Subject-Token': self._uuid(hex=True)}, \
+                self._token()
+        if path[:1] == ['projects'] and method == 'GET':
+            return self._list_or_show(
+                self.projects, path, query, 'projects',
+                base_url + '/v3/projects', filters=('name', 'domain_id'))
+        if path == ['regions'] and method == 'GET':
+            return 200, {}, {'regions': [
+                {'id': region, 'description': '', 'parent_region_id': None}
+                for region in self.regions]}
+        return self._not_found()
+
+
+class FakeCloudAdapter(BaseAdapter):
+    """A requests transport adapter that serves requests from a FakeCloud.
+    """
+
+    def __init__(self, cloud):
+        super(FakeCloudAdapter, self).__init__()
+        self.cloud = cloud
+
+    def send(self, request, **kwargs):
+        body = request.body
+        if isinstance(body, bytes):
+            body = body.decode('utf-8')
+        status, headers, content = self.cloud.handle(
+            request.method, request.url, json.loads(body) if body else None)
+
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response.headers['Content-Type'] = 'application/json'
+        response._content = json.dumps(content).encode('utf-8')
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.reason = 'OK' if status < 400 else 'Error'
+        return response
+
+    def close(self):
+        pass
@@ -0,0 +1,228 @@
+"""
+Short lived memoization of idempotent GET requests on a session.
+
+Scripts in the interpreter often do the same lookup over and over inside
+a loop, e.g. fetching the flavor for every server. Memoizing those GETs
+for the duration of a block turns thousands of identical API calls into
+a handful.
+
+Example use:
+In [1]: with oi.memo():
+   ...:     for server in oi.sdk.connection.compute.servers():
+   ...:         flavor = oi.sdk.connection.compute.get_flavor(
+   ...:             server.flavor_id)
+   ...:
+memo: 1000 requests, 988 hits (98.8%), 0 coalesced, 12 misses, 0 evictions,
+0 invalidations
+"""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import copy
+import json
+import threading
+import time
+
+from openstack_interpreter.common.session_hooks import request_service
+from openstack_interpreter.common.session_hooks import SAFE_METHODS
+from openstack_interpreter.common.session_hooks import wrap_request
+
+
+# request kwargs that don't change what the server sends back.
+IGNORED_KWARGS = (
+    'client_name', 'client_version', 'connect_retries',
+    'connect_retry_delay', 'global_request_id', 'log', 'logger',
+    'raise_exc', 'rate_semaphore', 'retriable_status_codes',
+    'status_code_retries', 'status_code_retry_delay', 'user_agent',
+)
+
+# request kwargs that mean the request can't safely be memoized.
+UNCACHEABLE_KWARGS = ('data', 'files', 'json', 'stream')
+
+
+class _Flight(object):
+    """A request currently being made that others can wait on."""
+
+    def __init__(self, generation):
+        self.generation = generation
+        self.event = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class RequestMemo(object):
+    """
+    A size bounded, time limited LRU cache of GET responses.
+
+    Identical GET requests made while another is still in flight are
+    coalesced, waiting on and sharing the result of the first rather than
+    being sent again.
+
+    Any other request, such as a POST to stop a server, is treated as a
+    write to its service and drops every cached response for that
+    service, so polling for the result of a change still works.
+
+    fields:
+      - ttl
+          Seconds a response is reused for. None means for as long
+          as the memo is in use.
+      - maxsize
+          Maximum number of responses kept.
+      - stats
+          dict of hits, misses, coalesced requests, evictions and
+          responses dropped by writes (invalidations).
+    """
+
+    def __init__(self, ttl=60, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        # bumped on every write, so responses to GETs sent before a
+        # write aren't cached after it.
+        self._generation = 0
+        self.stats = {
+            'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0,
+            'invalidations': 0}
+
+    @property
+    def requests(self):
+        return (self.stats['hits'] + self.stats['misses'] +
+                self.stats['coalesced'])
+
+    @property
+    def hit_rate(self):
+        """Fraction of requests that didn't go to the API."""
+        if not self.requests:
+            return 0.0
+        return float(
+            self.stats['hits'] + self.stats['coalesced']) / self.requests
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._generation += 1
+
+    def invalidate(self, service):
+        """Drop all cached responses for the given service."""
+        with self._lock:
+            self._generation += 1
+            for key in [k for k in self._cache if k[0] == service]:
+                del self._cache[key]
+                self.stats['invalidations'] += 1
+
+    def _make_key(self, url, method, kwargs):
+        if method.upper() != 'GET':
+            return None
+        for kwarg in UNCACHEABLE_KWARGS:
+            if kwargs.get(kwarg):
+                return None
+        key_kwargs = dict(
+            (k, v) for k, v in kwargs.items() if k not in IGNORED_KWARGS)
+        return (request_service(url, kwargs), url,
+                json.dumps(key_kwargs, sort_keys=True, default=repr))
+
+    def _get(self, key):
+        """Get a cached response, must be called holding the lock."""
+        try:
+            expires, response = self._cache.pop(key)
+        except KeyError:
+            return None
+        if expires is not None and expires < time.time():
+            return None
+        # reinsert to mark as most recently used
+        self._cache[key] = (expires, response)
+        return response
+
+    def _set(self, key, response):
+        """Cache a response, must be called holding the lock."""
+        expires = None
+        if self.ttl is not None:
+            expires = time.time() + self.ttl
+        self._cache.pop(key, None)
+        self._cache[key] = (expires, response)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def request(self, next_request, url, method, **kwargs):
+        """Session request wrapper, see session_hooks.wrap_request."""
+        if method.upper() not in SAFE_METHODS:
+            service = request_service(url, kwargs)
+            # invalidate both before and after, so nothing cached while
+            # the write is in flight survives it either.
+            self.invalidate(service)
+            try:
+                return next_request(url, method, **kwargs)
+            finally:
+                self.invalidate(service)
+
+        key = self._make_key(url, method, kwargs)
+        if key is None:
+            return next_request(url, method, **kwargs)
+
+        with self._lock:
+            response = self._get(key)
+            if response is not None:
+                self.stats['hits'] += 1
+                return copy.copy(response)
+            flight = self._in_flight.get(key)
+            if flight is None:
+                leader = True
+                flight = self._in_flight[key] = _Flight(self._generation)
+                self.stats['misses'] += 1
+            else:
+                leader = False
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.copy(flight.response)
+
+        try:
+            flight.response = next_request(url, method, **kwargs)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+                if flight.response is not None and \
+                        flight.response.status_code < 400 and \
+                        flight.generation == self._generation:
+                    self._set(key, flight.response)
+            flight.event.set()
+        return copy.copy(flight.response)
+
+    def summary(self):
+        return (
+            "memo: %s requests, %s hits (%.1f%%), %s coalesced, "
+            "%s misses, %s evictions, %s invalidations" % (
+                self.requests, self.stats['hits'], self.hit_rate * 100,
+                self.stats['coalesced'], self.stats['misses'],
+                self.stats['evictions'], self.stats['invalidations']))
+
+
+@contextmanager
+def memoize(session, ttl=60, maxsize=1024, verbose=True):
+    """
+    Memoize GET requests made via the given session within a block.
+
+    Yields the RequestMemo so its stats can be inspected afterwards.
+
+    :param session: keystoneauth session to memoize requests on
+    :param ttl: seconds a response is reused for, None for no expiry
+    :param maxsize: maximum number of responses kept
+    :param verbose: print the hit rate summary at the end of the block
+    """
+    memo = RequestMemo(ttl=ttl, maxsize=maxsize)
+    unwrap = wrap_request(session, memo.request)
+    try:
+        yield memo
+    finally:
+        unwrap()
+        if verbose:
+            print(memo.summary())
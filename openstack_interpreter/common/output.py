@@ -8,15 +8,25 @@ E.g.:
 In [1]: output.print_styled?
 """
 
+import csv
 from fcntl import ioctl
+import itertools
+import numbers
 import os
+import pickle
 import textwrap
 import struct
 import sys
+import tempfile
 import termios
+import threading
 import json
+import uuid
 import prettytable
 
+from openstack_interpreter.common.session_hooks import request_path
+from openstack_interpreter.common.session_hooks import request_service
+
 available_text_styles = {
     'normal': '0', 'bold': '1', 'faint': '2', 'italic': '3', 'underline': '4',
     'negative': '7', 'strikethrough': '9',
@@ -69,11 +79,31 @@ def print_styled(text, styles):
     print(style_text(text, styles))
 
 
-def json_formatter(js, wrap=None):
-    """Formatter for json that can wrap it."""
+def _truncate(text, max_length):
+    """Cut text down to max_length, returning it and how much was cut."""
+    if max_length is None or len(text) <= max_length:
+        return text, 0
+    return text[:max_length], len(text) - max_length
+
+
+def _add_truncation_marker(text, truncated):
+    # added after any wrapping, so the styling is never split up.
+    if not truncated:
+        return text
+    return "%s\n%s" % (text, style_text(
+        "... (%s more characters)" % truncated, ['faint']))
+
+
+def json_formatter(js, wrap=None, max_length=None):
+    """Formatter for json that can wrap it.
+
+    If max_length is given, the json is truncated to that many characters
+    before being wrapped.
+    """
     value = json.dumps(
         js, indent=2, ensure_ascii=False,
         separators=(', ', ': '))
+    value, truncated = _truncate(value, max_length)
     # as json sort of does it's own line splitting, we have to check
     # if each line is over the wrap limit, and split ourselves.
     if wrap:
@@ -87,40 +117,87 @@ def json_formatter(js, wrap=None):
                     line = line[wrap:]
             else:
                 lines.append(line)
-        value = ""
-        for line in lines[:-1]:
-            value += "%s\n" % line
-        value += "%s" % lines[-1]
-    return value
+        value = '\n'.join(lines)
+    return _add_truncation_marker(value, truncated)
 
 
-def text_wrap_formatter(text, wrap=None):
+def text_wrap_formatter(text, wrap=None, max_length=None):
     """formatter to wrap the text"""
-    return '\n'.join(textwrap.wrap(text or '', wrap or 55))
+    text, truncated = _truncate(text or '', max_length)
+    return _add_truncation_marker(
+        '\n'.join(textwrap.wrap(text, wrap or 55)), truncated)
 
 
-def newline_list_formatter(text_list, wrap=None):
+def newline_list_formatter(text_list, wrap=None, max_length=None):
     """format list with newline for each element"""
-    return '\n'.join(text_list or [])
+    return _add_truncation_marker(
+        *_truncate('\n'.join(text_list or []), max_length))
 
 
-def print_dict(dictionary, formatters=None, wrap=None,
-               titles=['Property', 'Value'], sortby=None):
-    """
-    Will print a prettytable of the given dict.
+# formatters that take max_length, and so can truncate values before
+# doing the work of formatting them.
+_length_limited_formatters = (
+    json_formatter, text_wrap_formatter, newline_list_formatter)
 
-    :param dictionary: dictionary to print
-    :param formatters: `dict` of callables for field formatting
-    :param warp: a width value to wrap for.
-    :param titles: Labels to use in the heading of the table, default to
-        ['Property', 'Value']
-    :param sortby: column of the table to sort by, defaults to 'Property'
-    .
+
+# for each type, the public names on the class that are worth evaluating
+# in print_object, and the names of its methods which aren't.
+_type_fields = {}
+
+
+def _has_custom_dir(obj_type):
+    return any('__dir__' in vars(base)
+               for base in obj_type.__mro__ if base is not object)
+
+
+def _object_fields(obj):
+    """Get the public, non callable attribute names and values of obj.
+
+    Each attribute is only evaluated once, and the methods of a type are
+    worked out once and cached, so they are never evaluated at all.
     """
+    obj_type = type(obj)
+    if obj_type not in _type_fields:
+        candidates = []
+        methods = set()
+        for name in dir(obj_type):
+            if name.startswith("_"):
+                continue
+            attr = getattr(obj_type, name, None)
+            if isinstance(attr, (classmethod, staticmethod)) or (
+                    callable(attr) and not isinstance(attr, type)):
+                methods.add(name)
+            else:
+                candidates.append(name)
+        _type_fields[obj_type] = (
+            _has_custom_dir(obj_type), candidates, methods)
+    custom_dir, candidates, methods = _type_fields[obj_type]
+
+    if custom_dir:
+        names = dir(obj)
+    else:
+        names = set(candidates)
+        names.update(getattr(obj, '__dict__', {}))
+
+    fields = []
+    for name in sorted(names):
+        if name.startswith("_") or name in methods:
+            continue
+        try:
+            value = getattr(obj, name)
+        except Exception as e:
+            value = style_text("<error: %r>" % e, ['red'])
+        if callable(value):
+            continue
+        fields.append((name, value))
+    return fields
+
+
+def _print_property_table(fields, formatters, wrap, titles, sortby,
+                          max_value_length, pager):
+    """Print a two column table of (key, value) pairs."""
     if len(titles) != 2:
         print_styled("Titles must exactly 2 values.", ['red'])
-    if not sortby:
-        sortby = titles[0]
     if not wrap:
         # 2 columns padded by 1 on each side = 4
         # 3 x '|' as border and separator = 3
@@ -128,87 +205,297 @@ def print_dict(dictionary, formatters=None, wrap=None,
         padding = 7
         # Now we need to find what the longest key is
         longest_key = 0
-        for key in dictionary.keys():
+        for key, value in fields:
             if len(key) > longest_key:
                 longest_key = len(key)
         # the wrap for the value column is based on
         # what is left after we account for the padding
         # and longest key
-        wrap = terminal_width() - padding - longest_key
+        wrap = max(
+            (terminal_width() or 80) - padding - longest_key, 20)
 
     formatters = formatters or {}
     pt = prettytable.PrettyTable(titles,
                                  caching=False, print_empty=False)
     pt.align = 'l'
 
-    for field in dictionary.keys():
-        if field in formatters:
-            value = formatters[field](dictionary[field], wrap=wrap)
-            pt.add_row([field, value])
+    for field, value in fields:
+        formatter = formatters.get(field)
+        if formatter in _length_limited_formatters:
+            value = formatter(
+                value, wrap=wrap, max_length=max_value_length)
+        elif formatter is not None:
+            value = _add_truncation_marker(*_truncate(
+                formatter(value, wrap=wrap), max_value_length))
         else:
-            value = textwrap.fill(str(dictionary[field]), wrap)
-            pt.add_row([field, value])
+            # truncate before wrapping, as wrapping huge values is slow
+            value, truncated = _truncate(str(value), max_value_length)
+            value = _add_truncation_marker(
+                textwrap.fill(value, wrap), truncated)
+        pt.add_row([field, value])
     if sortby:
-        print(pt.get_string(sortby=sortby))
+        table = pt.get_string(sortby=sortby)
     else:
-        print(pt.get_string())
+        table = pt.get_string()
+    if pager:
+        # ipython's pager handles the ANSI styling in the table.
+        from IPython.core import page
+        page.page(table)
+    else:
+        print(table)
+
+
+def print_dict(dictionary, formatters=None, wrap=None,
+               titles=['Property', 'Value'], sortby=None,
+               max_value_length=4096, pager=False):
+    """
+    Will print a prettytable of the given dict.
+
+    :param dictionary: dictionary to print
+    :param formatters: `dict` of callables for field formatting
+    :param warp: a width value to wrap for.
+    :param titles: Labels to use in the heading of the table, default to
+        ['Property', 'Value']
+    :param sortby: column of the table to sort by, defaults to 'Property'
+    :param max_value_length: values longer than this many characters are
+        truncated, None to show them in full.
+    :param pager: page the output, useful with max_value_length=None
+    .
+    """
+    if not sortby:
+        sortby = titles[0]
+    _print_property_table(
+        list(dictionary.items()), formatters, wrap, titles, sortby,
+        max_value_length, pager)
 
 
 def print_object(obj, formatters=None, wrap=None,
-                 titles=['Property', 'Value'], sortby='Property'):
+                 titles=['Property', 'Value'], sortby='Property',
+                 max_value_length=4096, pager=False):
     """
     Will print a prettytable of the given object.
 
+    Each attribute is only evaluated once, so lazy or expensive
+    attributes are only fetched the once.
+
     :param obj: object to print
     :param formatters: `dict` of callables for field formatting
     :param warp: a width value to wrap for.
     :param titles: Labels to use in the heading of the table, default to
         ['Property', 'Value']
     :param sortby: column of the table to sort by, defaults to 'Property'
+    :param max_value_length: values longer than this many characters are
+        truncated, None to show them in full.
+    :param pager: page the output, useful with max_value_length=None
     .
     """
+    _print_property_table(
+        _object_fields(obj), formatters, wrap, titles, sortby,
+        max_value_length, pager)
 
-    fields = []
-    for field in dir(obj):
-        if field.startswith("_") or callable(getattr(obj, field)):
-            continue
-        fields.append(field)
 
-    if not wrap:
-        # 2 columns padded by 1 on each side = 4
-        # 3 x '|' as border and separator = 3
-        # total non-content padding = 7
-        padding = 7
-        # Now we need to find what the longest key is
-        longest_key = 0
-        for key in fields:
-            if not key.startswith("_") and len(key) > longest_key:
-                longest_key = len(key)
-        # the wrap for the value column is based on
-        # what is left after we account for the padding
-        # and longest key
-        wrap = terminal_width() - padding - longest_key
+class Related(object):
+    """
+    Declare a print_list column as a lookup of a related resource.
+
+    Rather than calling the API once per row to find, say, the name of
+    each server's flavor, print_list collects the distinct ids across all
+    the rows, does a single bulk list call per lookup, and fills the
+    column from that.
+
+    :param source: field on each row holding the related id, or a
+        callable taking the row and returning the id
+    :param lookup: callable returning an iterable of all the related
+        resources, e.g. conn.compute.flavors
+    :param key: field on the related resources to match the id against,
+        defaults to 'id'
+    :param attr: field of the related resource to show in the column,
+        defaults to 'name'. None passes the whole resource to any
+        formatter for the column.
+    :param filters: kwargs passed to the lookup callable
+
+    examples:
+    In [1]: output.print_list(
+                servers, ['name', 'flavor'],
+                prefetch={'flavor': output.Related(
+                    'flavor_id', conn.compute.flavors)})
+    In [2]: output.print_list(
+                servers, ['name', 'project'],
+                prefetch={'project': output.Related(
+                    'project_id', conn.identity.projects,
+                    domain_id='default')})
+    """
 
-    formatters = formatters or {}
-    pt = prettytable.PrettyTable(titles,
-                                 caching=False, print_empty=False)
-    pt.align = 'l'
+    def __init__(self, source, lookup, key='id', attr='name', **filters):
+        self.source = source
+        self.lookup = lookup
+        self.key = key
+        self.attr = attr
+        self.filters = filters
 
-    for field in fields:
-        if field in formatters:
-            value = formatters[field](getattr(obj, field), wrap=wrap)
-            pt.add_row([field, value])
-        else:
-            value = textwrap.fill(str(getattr(obj, field)), wrap)
-            pt.add_row([field, value])
-    if sortby:
-        print(pt.get_string(sortby=sortby))
+    def get_id(self, obj, mixed_case_fields):
+        if callable(self.source):
+            return self.source(obj)
+        return _get_field_data(obj, self.source, mixed_case_fields)
+
+    @property
+    def lookup_key(self):
+        """Columns sharing a lookup_key share the one bulk list call."""
+        return (self.lookup, repr(sorted(self.filters.items())), self.key)
+
+
+def _get_field_data(obj, field, mixed_case_fields, default=''):
+    if field in mixed_case_fields:
+        field_name = field.replace(' ', '_')
     else:
-        print(pt.get_string())
+        field_name = field.lower().replace(' ', '_')
+    data = getattr(obj, field_name, default)
+    if not data:
+        try:
+            data = obj.get(field_name, default)
+        except Exception:
+            pass
+    return data
+
+
+def _prefetch_related(objs, prefetch, mixed_case_fields, resolved=None):
+    """Resolve the Related columns for objs with one call per lookup.
+
+    Returns a dict of field to a list with the value for each row.
+
+    Pass in the same resolved dict to reuse lookups across calls.
+    """
+    ids = {}
+    for field, related in prefetch.items():
+        ids[field] = [related.get_id(o, mixed_case_fields) for o in objs]
+
+    if resolved is None:
+        resolved = {}
+    for field, related in prefetch.items():
+        if related.lookup_key in resolved:
+            continue
+        resolved[related.lookup_key] = dict(
+            (_get_field_data(r, related.key, []), r)
+            for r in related.lookup(**related.filters))
+
+    values = {}
+    for field, related in prefetch.items():
+        resources = resolved[related.lookup_key]
+        values[field] = []
+        for related_id in ids[field]:
+            resource = resources.get(related_id)
+            if resource is None:
+                # fallback to the id itself if we couldn't find it
+                values[field].append(related_id)
+            elif related.attr is None:
+                values[field].append(resource)
+            else:
+                values[field].append(
+                    _get_field_data(resource, related.attr, []))
+    return values
+
+
+# print_list patches keystoneauth's Session.request to watch for API
+# calls while rendering. The patch is shared by all print_list calls in
+# progress, and which watcher (if any) a call is counted against is
+# tracked per thread, so calls made from other threads are never
+# counted against rows being rendered.
+_watch_lock = threading.Lock()
+_watch_state = {'count': 0, 'original': None}
+_watch_local = threading.local()
+
+
+def _watched_request(session, url, method, **kwargs):
+    watcher = getattr(_watch_local, 'watcher', None)
+    if watcher is not None and watcher.row is not None:
+        watcher._record(url, method, kwargs)
+    return _watch_state['original'](session, url, method, **kwargs)
+
+
+def _install_watch():
+    try:
+        from keystoneauth1 import session
+    except ImportError:
+        return False
+    with _watch_lock:
+        if _watch_state['count'] == 0:
+            _watch_state['original'] = session.Session.request
+            session.Session.request = _watched_request
+        _watch_state['count'] += 1
+    return True
+
+
+def _uninstall_watch():
+    from keystoneauth1 import session
+    with _watch_lock:
+        _watch_state['count'] -= 1
+        if _watch_state['count'] == 0:
+            # only restore if nothing else has patched over us since.
+            if session.Session.request is _watched_request:
+                session.Session.request = _watch_state['original']
+            _watch_state['original'] = None
+
+
+class _RequestWatcher(object):
+    """Watch for API calls made while rendering rows in print_list.
+
+    If the same endpoint is called from a formatter (or a lazy attribute)
+    for every row, that is a lookup that should be using Related in
+    print_list instead. Only calls made from the rendering thread count.
+    """
+
+    # don't bother warning about small tables
+    min_rows = 5
+
+    def __init__(self):
+        self.row = None
+        self._rows = 0
+        self._calls = {}
+        self._installed = False
+        self._previous = None
+
+    def __enter__(self):
+        self._installed = _install_watch()
+        self._previous = getattr(_watch_local, 'watcher', None)
+        _watch_local.watcher = self
+        return self
+
+    def __exit__(self, *args):
+        _watch_local.watcher = self._previous
+        if self._installed:
+            _uninstall_watch()
+
+    def start_row(self, row):
+        self.row = row
+        self._rows += 1
+
+    def end_row(self):
+        self.row = None
+
+    def _record(self, url, method, kwargs):
+        # drop the last part of the path as it is likely an id
+        path = request_path(url).rstrip('/').rsplit('/', 1)[0]
+        endpoint = "%s %s %s/<id>" % (
+            method.upper(), request_service(url, kwargs), path)
+        self._calls.setdefault(endpoint, set()).add(self.row)
+
+    def warn(self):
+        if self._rows < self.min_rows:
+            return
+        for endpoint, rows in sorted(self._calls.items()):
+            if len(rows) == self._rows:
+                print(
+                    style_text("WARNING: ", ['yellow', 'bold']) +
+                    style_text(
+                        "'%s' was called once per row while rendering.\n"
+                        "Consider using output.Related in the prefetch "
+                        "argument, or wrapping this in 'with oi.memo():'."
+                        % endpoint,
+                        ['yellow']))
 
 
 def print_list(objs, fields, formatters=None, sortby_index=None,
-               mixed_case_fields=None, field_labels=None):
+               mixed_case_fields=None, field_labels=None, prefetch=None):
     """Print a list or objects as a table, one row per object.
 
     :param objs: iterable of objects or dicts
@@ -219,10 +506,15 @@ def print_list(objs, fields, formatters=None, sortby_index=None,
         have mixed case names (e.g., 'serverId')
     :param field_labels: Labels to use in the heading of the table, default to
         fields.
+    :param prefetch: `dict` of fields to Related lookups, which are resolved
+        with one bulk API call per lookup rather than one per row.
+        For help do:
+        In [1]: output.Related?
     """
     formatters = formatters or {}
     mixed_case_fields = mixed_case_fields or []
     field_labels = field_labels or fields
+    prefetch = prefetch or {}
     if len(field_labels) != len(fields):
         raise ValueError(
             "Field labels list %(labels)s has different number "
@@ -236,26 +528,29 @@ def print_list(objs, fields, formatters=None, sortby_index=None,
     pt = prettytable.PrettyTable(field_labels)
     pt.align = 'l'
 
-    for o in objs:
-        row = []
-        for field in fields:
-            if field in mixed_case_fields:
-                field_name = field.replace(' ', '_')
-            else:
-                field_name = field.lower().replace(' ', '_')
-            data = getattr(o, field_name, '')
-            if not data:
-                try:
-                    data = o.get(field_name, '')
-                except Exception:
-                    pass
-            if field in formatters:
-                row.append(formatters[field](data))
-            else:
-                row.append(data)
-        pt.add_row(row)
+    related_values = {}
+    if prefetch:
+        objs = list(objs)
+        related_values = _prefetch_related(objs, prefetch, mixed_case_fields)
+
+    with _RequestWatcher() as watcher:
+        for i, o in enumerate(objs):
+            row = []
+            watcher.start_row(i)
+            for field in fields:
+                if field in related_values:
+                    data = related_values[field][i]
+                else:
+                    data = _get_field_data(o, field, mixed_case_fields)
+                if field in formatters:
+                    row.append(formatters[field](data))
+                else:
+                    row.append(data)
+            watcher.end_row()
+            pt.add_row(row)
 
     print(pt.get_string(**kwargs))
+    watcher.warn()
 
 
 def print_list_rows(rows, headers):
@@ -269,6 +564,276 @@ def print_list_rows(rows, headers):
     print(pt.get_string())
 
 
+EXPORT_FORMATS = ('csv', 'arrow', 'parquet')
+
+
+def _columnar_value(value):
+    """Make a value fit to be stored in a single typed column."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value, sort_keys=True, default=str)
+    return str(value)
+
+
+# the order columns widen in as more types of values are seen in them.
+_COLUMN_KINDS = ('null', 'bool', 'int', 'float', 'string')
+
+_INT64_MIN = -2 ** 63
+_INT64_MAX = 2 ** 63 - 1
+
+
+def _value_kind(value):
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, numbers.Integral):
+        if _INT64_MIN <= value <= _INT64_MAX:
+            return 'int'
+        return 'string'
+    if isinstance(value, numbers.Real):
+        return 'float'
+    return 'string'
+
+
+def _widen_kind(kind, other):
+    """The narrowest kind that can hold values of both kinds."""
+    if kind == other or other == 'null':
+        return kind
+    if kind == 'null':
+        return other
+    if set((kind, other)) == set(('int', 'float')):
+        return 'float'
+    return 'string'
+
+
+def _export_batches(objs, fields, formatters, mixed_case_fields, prefetch,
+                    batch_size):
+    """Yield lists of rows from objs, batch_size rows at a time.
+
+    Missing or empty values are None, and aren't passed to formatters.
+    """
+    objs = iter(objs)
+    resolved = {}
+    while True:
+        batch = list(itertools.islice(objs, batch_size))
+        if not batch:
+            return
+        related_values = {}
+        if prefetch:
+            related_values = _prefetch_related(
+                batch, prefetch, mixed_case_fields, resolved)
+        rows = []
+        for i, o in enumerate(batch):
+            row = []
+            for field in fields:
+                if field in related_values:
+                    data = related_values[field][i]
+                else:
+                    data = _get_field_data(
+                        o, field, mixed_case_fields, default=None)
+                if data == '':
+                    data = None
+                if data is not None and field in formatters:
+                    data = formatters[field](data)
+                row.append(_columnar_value(data))
+            rows.append(row)
+        yield rows
+
+
+def _write_csv(batches, path, headers):
+    if sys.version_info[0] < 3:
+        export_file = open(path, 'wb')
+    else:
+        export_file = open(path, 'w', newline='')
+    count = 0
+    with export_file:
+        writer = csv.writer(export_file)
+        writer.writerow(headers)
+        for rows in batches:
+            writer.writerows(rows)
+            count += len(rows)
+    return count
+
+
+def _arrow_type(pyarrow, kind):
+    return {
+        'bool': pyarrow.bool_(),
+        'int': pyarrow.int64(),
+        'float': pyarrow.float64(),
+    }.get(kind, pyarrow.string())
+
+
+def _column_converter(pyarrow, header, arrow_type, kind):
+    """Get a function to convert a column's values to its arrow type.
+
+    Raises ValueError if values of the given kind can't be stored as
+    that type without losing something.
+    """
+    allowed = None
+    convert = None
+    if pyarrow.types.is_string(arrow_type):
+        convert = str
+    elif pyarrow.types.is_floating(arrow_type):
+        allowed, convert = ('bool', 'int', 'float'), float
+    elif pyarrow.types.is_integer(arrow_type):
+        # pyarrow would silently truncate float values
+        allowed, convert = ('bool', 'int'), int
+    elif pyarrow.types.is_boolean(arrow_type):
+        allowed = ('bool', )
+    if allowed is not None and kind not in allowed + ('null', ):
+        raise ValueError(
+            "Column '%s' has %s values, which can't be stored as %s." %
+            (header, kind, arrow_type))
+    if convert is None:
+        return lambda values: values
+    return lambda values: [
+        v if v is None else convert(v) for v in values]
+
+
+def _write_arrow(batches, path, headers, format, types):
+    try:
+        import pyarrow
+        from pyarrow import ipc
+        from pyarrow import parquet
+    except ImportError:
+        raise ImportError(
+            "Exporting to '%s' requires pyarrow to be installed." % format)
+
+    # A column's type can't be known until every row has been seen, and
+    # the schema can't change once writing starts, so the rows are first
+    # spooled to a temporary file while working out the column types.
+    kinds = ['null'] * len(headers)
+    count = 0
+    with tempfile.TemporaryFile() as spool:
+        for rows in batches:
+            for row in rows:
+                for i, value in enumerate(row):
+                    kinds[i] = _widen_kind(kinds[i], _value_kind(value))
+            pickle.dump(rows, spool, pickle.HIGHEST_PROTOCOL)
+            count += len(rows)
+
+        fields = []
+        converters = []
+        for header, kind in zip(headers, kinds):
+            arrow_type = types.get(header, kind)
+            if isinstance(arrow_type, str):
+                arrow_type = _arrow_type(pyarrow, arrow_type)
+            converters.append(
+                _column_converter(pyarrow, header, arrow_type, kind))
+            fields.append(pyarrow.field(header, arrow_type))
+        schema = pyarrow.schema(fields)
+
+        if format == 'parquet':
+            writer = parquet.ParquetWriter(path, schema)
+        else:
+            writer = ipc.new_file(path, schema)
+        try:
+            spool.seek(0)
+            while True:
+                try:
+                    rows = pickle.load(spool)
+                except EOFError:
+                    break
+                columns = dict(
+                    (header, converters[i]([row[i] for row in rows]))
+                    for i, header in enumerate(headers))
+                writer.write_table(
+                    pyarrow.Table.from_pydict(columns, schema=schema))
+        finally:
+            writer.close()
+    return count
+
+
+def export(objs, fields, path, format='csv', formatters=None,
+           mixed_case_fields=None, field_labels=None, prefetch=None,
+           batch_size=1000, types=None):
+    """Write a list of objects to a file, one row per object.
+
+    Takes the same fields, formatters and prefetch as print_list, but
+    streams the rows out to a file batch_size rows at a time, so even huge
+    SDK generators can be exported without holding them all in memory.
+    Any prefetch lookups are done once, and reused for every batch.
+
+    Formats:
+      - csv
+          Always available.
+      - arrow
+          Arrow IPC file, requires pyarrow.
+          Load with: pandas.read_feather(path)
+      - parquet
+          Requires pyarrow.
+          Load with: pandas.read_parquet(path)
+
+    Values that are dicts or lists are stored as json, and missing values
+    are left empty (null). For arrow and parquet the type of each column
+    is worked out from all of its values: a column of ints with some
+    floats is stored as floats, and a column of any other mix of types is
+    stored as strings. Use types to set the type of a column explicitly.
+
+    The file is written to a temporary file next to path first, and only
+    moved over path once the export has succeeded, so a failed export
+    never leaves a partial file or touches an existing one.
+
+    Returns the number of rows written.
+
+    :param objs: iterable of objects or dicts
+    :param fields: attributes that correspond to columns, in order
+    :param path: file to write to
+    :param format: one of 'csv', 'arrow' or 'parquet'
+    :param formatters: `dict` of callables for field formatting
+    :param mixed_case_fields: fields corresponding to object attributes that
+        have mixed case names (e.g., 'serverId')
+    :param field_labels: Labels to use as column names, default to fields.
+    :param prefetch: `dict` of fields to Related lookups.
+    :param batch_size: number of rows to hold in memory at a time.
+    :param types: `dict` of field labels to column types for arrow and
+        parquet, either a pyarrow type or one of 'bool', 'int', 'float'
+        or 'string'.
+
+    examples:
+    In [1]: output.export(
+                conn.compute.servers(details=True, all_projects=True),
+                ['id', 'name', 'status', 'project_id', 'flavor_id'],
+                'servers.parquet', format='parquet')
+    In [2]: output.export(
+                conn.network.ports(), ['id', 'device_owner', 'fixed_ips'],
+                'ports.csv')
+    """
+    formatters = formatters or {}
+    mixed_case_fields = mixed_case_fields or []
+    field_labels = field_labels or fields
+    prefetch = prefetch or {}
+    if len(field_labels) != len(fields):
+        raise ValueError(
+            "Field labels list %(labels)s has different number "
+            "of elements than fields list %(fields)s",
+            {'labels': field_labels, 'fields': fields})
+    if format not in EXPORT_FORMATS:
+        raise ValueError(
+            "Unknown export format '%s', must be one of: %s" %
+            (format, ", ".join(EXPORT_FORMATS)))
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1.")
+
+    batches = _export_batches(
+        objs, fields, formatters, mixed_case_fields, prefetch, batch_size)
+    temp_path = '%s.%s.tmp' % (path, uuid.uuid4().hex)
+    try:
+        if format == 'csv':
+            count = _write_csv(batches, temp_path, field_labels)
+        else:
+            count = _write_arrow(
+                batches, temp_path, field_labels, format, types or {})
+        os.rename(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return count
+
+
 def terminal_width():
     if hasattr(os, 'get_terminal_size'):
         # python 3.3 onwards has built-in support for getting terminal size
@@ -0,0 +1,303 @@
+"""
+Adaptive, per endpoint rate limiting for a keystoneauth session.
+
+When scripts in the interpreter run requests in parallel, services can
+start responding with 429 or 503 errors. Rather than have every client
+deal with that differently (or not at all), the RateLimiter sits on the
+shared session and limits the number of concurrent requests to each
+(service, region) endpoint using AIMD (additive increase, multiplicative
+decrease): the limit grows slowly while requests succeed, and halves when
+the endpoint signals it is overloaded, either with an error or with a
+spike in latency compared to earlier calls of the same kind. Throttled
+requests are retried, honouring Retry-After.
+
+To see the current limits:
+In [1]: oi.rate_limiter.print_limits()
+"""
+
+from email.utils import mktime_tz
+from email.utils import parsedate_tz
+import random
+import re
+import threading
+import time
+
+from keystoneauth1 import exceptions
+
+from openstack_interpreter.common import output
+from openstack_interpreter.common.session_hooks import request_path
+from openstack_interpreter.common.session_hooks import request_region
+from openstack_interpreter.common.session_hooks import request_service
+from openstack_interpreter.common.session_hooks import SAFE_METHODS
+
+
+# responses that mean the service wants us to back off
+CONGESTION_STATUSES = (429, 503)
+
+# path segments that are likely ids, so calls for different resources
+# share a latency baseline.
+ID_PATTERN = re.compile(r'^([0-9a-fA-F-]{16,}|\d+)$')
+
+
+def _latency_key(url, method):
+    """The kind of call a request is, e.g. 'GET /v2.1/servers/<id>'."""
+    path = request_path(url)
+    return '%s %s' % (method.upper(), '/'.join(
+        '<id>' if ID_PATTERN.match(part) else part
+        for part in path.split('/')))
+
+
+def _replayable(kwargs):
+    """Whether the request body can be sent again.
+
+    A file or generator passed as data (e.g. an image upload) has
+    been consumed by the first attempt.
+    """
+    data = kwargs.get('data')
+    return data is None or isinstance(data, (bytes, str, type(u'')))
+
+
+def _retry_after(response):
+    """Seconds to wait according to a response's Retry-After header."""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    date = parsedate_tz(value)
+    if date is None:
+        return None
+    return max(mktime_tz(date) - time.time(), 0)
+
+
+class EndpointLimit(object):
+    """The concurrency limit and stats for a single endpoint.
+
+    fields:
+      - limit
+          Current number of concurrent requests allowed.
+      - in_flight
+          Number of requests currently being made.
+      - requests
+          Total requests made.
+      - congested
+          Number of times the endpoint signaled it was overloaded.
+      - retries
+          Number of requests retried after being throttled.
+      - latency
+          Moving average of request latency in seconds.
+      - latencies
+          Moving average of request latency for each kind of call,
+          which is what a request is compared to when deciding if it
+          was slow.
+    """
+
+    def __init__(self, limiter):
+        self._limiter = limiter
+        self._condition = threading.Condition()
+        self.limit = float(limiter.initial_limit)
+        self.in_flight = 0
+        self.requests = 0
+        self.congested = 0
+        self.retries = 0
+        self.latency = None
+        self.latencies = {}
+        self._blocked_until = 0
+        self._last_decrease = 0
+
+    def acquire(self):
+        with self._condition:
+            while True:
+                wait = self._blocked_until - time.time()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    break
+                self._condition.wait(wait if wait > 0 else None)
+            self.in_flight += 1
+            self.requests += 1
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def _decrease(self):
+        """Multiplicative decrease, at most once per request latency.
+
+        Requests already in flight when we decrease will likely see the
+        same congestion, so this stops one overload from collapsing the
+        limit all the way down.
+        """
+        now = time.time()
+        if now - self._last_decrease < (self.latency or 0):
+            return
+        self._last_decrease = now
+        self.limit = max(
+            self._limiter.min_limit, self.limit * self._limiter.decrease)
+
+    def _average(self, average, latency):
+        if average is None:
+            return latency
+        return average + self._limiter.smoothing * (latency - average)
+
+    def record(self, latency, key=None, congested=False, retry_after=None,
+               retrying=False):
+        limiter = self._limiter
+        with self._condition:
+            # compare against the same kind of call only, as a big list
+            # is always going to be slower than a show.
+            baseline = self.latencies.get(key)
+            slow = (
+                baseline is not None and
+                latency > limiter.min_slow_latency and
+                latency > baseline * limiter.latency_threshold)
+            self.latencies[key] = self._average(baseline, latency)
+            self.latency = self._average(self.latency, latency)
+
+            if retrying:
+                self.retries += 1
+            if congested or slow:
+                self.congested += 1
+                self._decrease()
+            else:
+                self.limit = min(
+                    limiter.max_limit,
+                    self.limit + limiter.increase / self.limit)
+            if retry_after:
+                self._blocked_until = max(
+                    self._blocked_until,
+                    time.time() + min(retry_after, limiter.max_retry_after))
+            self._condition.notify_all()
+
+
+class RateLimiter(object):
+    """
+    Adaptive concurrency limits for each (service, region) endpoint.
+
+    Installed on the interpreter's session, so it applies to all the
+    clients and the SDK. A single thread making requests one at a time
+    is never limited, although all requests to an endpoint will wait out
+    any Retry-After it sends.
+
+    fields:
+      - enabled
+          Set to False to stop limiting and retrying requests.
+      - limits
+          dict of (service, region) to EndpointLimit.
+      - initial_limit / min_limit / max_limit
+          Bounds on the concurrent requests allowed per endpoint.
+      - increase / decrease
+          Additive increase per window of successful requests, and
+          multiplicative decrease on congestion.
+      - latency_threshold / min_slow_latency
+          A request is treated as a congestion signal when it takes
+          latency_threshold times longer than the average for the same
+          kind of call (method and path) to the endpoint, and longer
+          than min_slow_latency seconds.
+      - max_retries / max_retry_after
+          How many times, and for at most how long each time, a
+          throttled request will wait and be retried. Requests are
+          retried after a 429, or a 503 for GET, HEAD and OPTIONS, but
+          never if their body was a file or generator that can't be
+          sent again.
+
+    methods:
+      - print_limits
+          Print the current limits and stats for each endpoint.
+    """
+
+    def __init__(self, initial_limit=16, min_limit=1, max_limit=128,
+                 increase=1.0, decrease=0.5, latency_threshold=5.0,
+                 min_slow_latency=1.0, max_retries=5, max_retry_after=60,
+                 backoff=0.5):
+        self.enabled = True
+        self.initial_limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_threshold = latency_threshold
+        self.min_slow_latency = min_slow_latency
+        self.smoothing = 0.2
+        self.max_retries = max_retries
+        self.max_retry_after = max_retry_after
+        self.backoff = backoff
+        self.limits = {}
+        self._lock = threading.Lock()
+
+    def _endpoint(self, url, kwargs):
+        key = (request_service(url, kwargs), request_region(kwargs))
+        with self._lock:
+            if key not in self.limits:
+                self.limits[key] = EndpointLimit(self)
+            return self.limits[key]
+
+    def _backoff(self, attempt):
+        """Exponential backoff with jitter, for when there's no Retry-After.
+        """
+        return min(
+            self.backoff * 2 ** attempt * random.uniform(0.5, 1.5),
+            self.max_retry_after)
+
+    def request(self, next_request, url, method, **kwargs):
+        """Session request wrapper, see session_hooks.wrap_request."""
+        if not self.enabled:
+            return next_request(url, method, **kwargs)
+
+        endpoint = self._endpoint(url, kwargs)
+        key = _latency_key(url, method)
+        replayable = _replayable(kwargs)
+        raise_exc = kwargs.pop('raise_exc', True)
+        attempt = 0
+        while True:
+            endpoint.acquire()
+            start = time.time()
+            try:
+                response = next_request(
+                    url, method, raise_exc=False, **kwargs)
+            finally:
+                endpoint.release()
+
+            congested = response.status_code in CONGESTION_STATUSES
+            retry_after = _retry_after(response) if congested else None
+            # only safe methods are retried after a 503, as the request
+            # may have been partially processed. A 429 means it wasn't,
+            # so is always retried.
+            retrying = (
+                attempt < self.max_retries and congested and replayable and
+                (response.status_code == 429 or
+                 method.upper() in SAFE_METHODS))
+            endpoint.record(
+                time.time() - start, key=key, congested=congested,
+                retry_after=retry_after, retrying=retrying)
+
+            if not retrying:
+                break
+            if retry_after is None:
+                time.sleep(self._backoff(attempt))
+            attempt += 1
+
+        if raise_exc and response.status_code >= 400:
+            raise exceptions.from_response(response, method, url)
+        return response
+
+    def reset(self):
+        """Forget all learned limits and stats."""
+        with self._lock:
+            self.limits = {}
+
+    def print_limits(self):
+        """Print the current limits and stats for each endpoint."""
+        rows = []
+        for (service, region), limit in sorted(
+                self.limits.items(), key=lambda item: str(item[0])):
+            rows.append([
+                service, region or '', int(limit.limit), limit.in_flight,
+                limit.requests, limit.congested, limit.retries,
+                '%.1f' % (limit.latency * 1000)
+                if limit.latency is not None else '',
+            ])
+        output.print_list_rows(rows, [
+            'service', 'region', 'limit', 'in flight', 'requests',
+            'congested', 'retries', 'latency (ms)'])
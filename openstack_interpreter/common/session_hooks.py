@@ -0,0 +1,106 @@
+"""
+Helpers for layering extra behaviour over a keystoneauth session.
+
+Every client the interpreter builds (both the python clients and the SDK)
+ends up calling `session.request(url, method, **kwargs)`, so wrapping that
+one method on the shared session lets us observe or alter every API call
+made from the interpreter.
+"""
+
+
+import threading
+
+try:
+    from urllib import parse as urlparse
+except ImportError:
+    # python 2
+    import urlparse
+
+
+# methods that don't change anything, so are safe to cache or resend.
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+# guards installing and removing wrappers on any session
+_lock = threading.Lock()
+
+
+def request_service(url, kwargs):
+    """The service a request is for.
+
+    Taken from the endpoint_filter or service_type the clients pass to
+    session.request, falling back to the host of the url.
+    """
+    endpoint_filter = kwargs.get('endpoint_filter') or {}
+    service = (endpoint_filter.get('service_type') or
+               kwargs.get('service_type'))
+    if service:
+        return service
+    return urlparse.urlparse(url).netloc
+
+
+def request_region(kwargs):
+    """The region a request is for, or None if it doesn't say."""
+    endpoint_filter = kwargs.get('endpoint_filter') or {}
+    return (endpoint_filter.get('region_name') or
+            kwargs.get('region_name'))
+
+
+def request_path(url):
+    """The path of a request's url, without any query."""
+    return urlparse.urlparse(url).path
+
+
+def _send(session, wrappers, url, method, **kwargs):
+    """Send a request through the given wrappers in order."""
+    if not wrappers:
+        # look up the class method at call time rather than install time
+        # so that class level patching of the session is still honoured.
+        return type(session).request(session, url, method, **kwargs)
+
+    def next_request(url, method, **kwargs):
+        return _send(session, wrappers[1:], url, method, **kwargs)
+
+    return wrappers[0](next_request, url, method, **kwargs)
+
+
+def wrap_request(session, wrapper):
+    """Install a wrapper around `session.request`.
+
+    The wrapper is called as `wrapper(next_request, url, method, **kwargs)`
+    and must call `next_request(url, method, **kwargs)` to actually send the
+    request. Wrappers stack, with the most recently installed one being
+    called first.
+
+    Returns a callable that removes the wrapper again. Wrappers can be
+    removed in any order, e.g. by memo blocks in different threads that
+    overlap without nesting.
+
+    :param session: keystoneauth session to wrap
+    :param wrapper: callable to handle requests made via the session
+    """
+    with _lock:
+        wrappers = session.__dict__.get('_request_wrappers')
+        if wrappers is None:
+            wrappers = session._request_wrappers = []
+
+            def request(url, method, **kwargs):
+                return _send(
+                    session, tuple(reversed(wrappers)), url, method,
+                    **kwargs)
+
+            session.request = request
+        wrappers.append(wrapper)
+
+    def unwrap():
+        with _lock:
+            for i, installed in enumerate(wrappers):
+                if installed is wrapper:
+                    del wrappers[i]
+                    break
+            if not wrappers and \
+                    session.__dict__.get('_request_wrappers') is wrappers:
+                del session._request_wrappers
+                session.__dict__.pop('request', None)
+
+    return unwrap
@@ -0,0 +1,335 @@
+"""
+Throughput and latency benchmarks for the interpreter's helpers.
+
+These run against an offline FakeCloud, so they need no credentials and
+give repeatable numbers. They measure listing via the SDK, rendering with
+the output functions, fanning out across regions, and the metering and
+orchestration helpers, so that changes to the interpreter's own code can
+be checked for performance regressions.
+
+From the interpreter:
+In [1]: from openstack_interpreter.v1 import benchmark
+In [2]: results = benchmark.run(servers=5000, latency=0.005)
+
+From the shell, saving a baseline and later comparing against it:
+$ python -m openstack_interpreter.v1.benchmark --save baseline.json
+$ python -m openstack_interpreter.v1.benchmark --compare baseline.json
+"""
+
+import argparse
+from contextlib import contextmanager
+from datetime import datetime
+from datetime import timedelta
+import json
+from multiprocessing.pool import ThreadPool
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from openstack_interpreter.common import fake_cloud
+from openstack_interpreter.common import output
+
+
+SERVER_FIELDS = ['id', 'name', 'status', 'project_id', 'flavor']
+
+
+@contextmanager
+def _quiet():
+    """Send anything printed to stdout to /dev/null."""
+    stdout = sys.stdout
+    with open(os.devnull, 'w') as devnull:
+        sys.stdout = devnull
+        try:
+            yield
+        finally:
+            sys.stdout = stdout
+
+
+def _flavor_id(server):
+    return server.flavor['id']
+
+
+def bench_list_servers(oi, cloud):
+    return len(list(oi.sdk.connection.compute.servers()))
+
+
+def bench_list_ports(oi, cloud):
+    return len(list(oi.sdk.connection.network.ports()))
+
+
+def bench_list_volumes(oi, cloud):
+    return len(list(oi.sdk.connection.block_storage.volumes()))
+
+
+def bench_fan_out_regions(oi, cloud):
+    def list_servers(region):
+        return list(oi.sdk.get_connection(
+            region_name=region).compute.servers())
+
+    pool = ThreadPool(len(cloud.regions))
+    try:
+        return sum(len(servers) for servers in pool.map(
+            list_servers, cloud.regions))
+    finally:
+        pool.terminate()
+
+
+def bench_print_list(oi, cloud, servers):
+    with _quiet():
+        output.print_list(servers, SERVER_FIELDS)
+    return len(servers)
+
+
+def bench_print_list_prefetch(oi, cloud, servers):
+    conn = oi.sdk.connection
+    with _quiet():
+        output.print_list(
+            servers, SERVER_FIELDS,
+            prefetch={'flavor': output.Related(
+                _flavor_id, conn.compute.flavors)})
+    return len(servers)
+
+
+def bench_per_row_lookup_memo(oi, cloud, servers):
+    conn = oi.sdk.connection
+    with oi.memo(verbose=False):
+        for server in servers:
+            conn.compute.get_flavor(_flavor_id(server))
+    return len(servers)
+
+
+def bench_parallel_lookups(oi, cloud, servers):
+    conn = oi.sdk.connection
+    servers = servers[:200]
+    pool = ThreadPool(16)
+    try:
+        pool.map(
+            lambda server: conn.compute.get_flavor(_flavor_id(server)),
+            servers)
+    finally:
+        pool.terminate()
+    return len(servers)
+
+
+def bench_print_object(oi, cloud, servers):
+    with _quiet():
+        for server in servers[:100]:
+            output.print_object(server, wrap=80)
+    return min(len(servers), 100)
+
+
+def bench_export_csv(oi, cloud, servers):
+    path = tempfile.mkdtemp()
+    try:
+        return output.export(
+            servers, SERVER_FIELDS, os.path.join(path, 'servers.csv'),
+            prefetch={'flavor': output.Related(
+                _flavor_id, oi.sdk.connection.compute.flavors)})
+    finally:
+        shutil.rmtree(path)
+
+
+def bench_metering_aggregate(oi, cloud):
+    start = datetime(2018, 1, 1)
+    return len(list(oi.metering.aggregate(
+        'cpu_util', start, start + timedelta(hours=6),
+        window=timedelta(hours=1))))
+
+
+def bench_orchestration_walk(oi, cloud):
+    oi.orchestration.clear_cache()
+    return len(oi.orchestration.walk_stack('stack-0'))
+
+
+# (name, function, takes servers). Benchmarks that take the already listed
+# servers only measure rendering and any lookups they make themselves.
+BENCHMARKS = [
+    ('list_servers', bench_list_servers, False),
+    ('list_ports', bench_list_ports, False),
+    ('list_volumes', bench_list_volumes, False),
+    ('fan_out_regions', bench_fan_out_regions, False),
+    ('print_list', bench_print_list, True),
+    ('print_list_prefetch', bench_print_list_prefetch, True),
+    ('per_row_lookup_memo', bench_per_row_lookup_memo, True),
+    ('parallel_lookups', bench_parallel_lookups, True),
+    ('print_object', bench_print_object, True),
+    ('export_csv', bench_export_csv, True),
+    ('metering_aggregate', bench_metering_aggregate, False),
+    ('orchestration_walk', bench_orchestration_walk, False),
+]
+
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def run(regions=2, servers=500, latency=0.0, error_rate=0.0, repeat=5,
+        only=None, verbose=True):
+    """Run the benchmarks against a new FakeCloud.
+
+    Returns a dict of benchmark name to results, each a dict of:
+      - items: number of items processed in a run
+      - requests: number of API requests made in a run
+      - best / median: seconds a run took
+      - items_per_second: items over the best run time
+      - ms_per_request: best run time over the number of requests
+      - error: the error if the benchmark failed, else None
+
+    :param regions: number of regions in the fake cloud
+    :param servers: number of servers (and ports and volumes) per region
+    :param latency: seconds every request to the fake cloud takes
+    :param error_rate: fraction of requests to the fake cloud that fail
+    :param repeat: number of times to run each benchmark
+    :param only: list of benchmark names to run, defaults to all
+    :param verbose: print a table of the results
+    """
+    cloud = fake_cloud.FakeCloud(
+        regions=regions, servers=servers, latency=latency,
+        error_rate=error_rate)
+    oi = cloud.interpreter()
+    server_list = list(oi.sdk.connection.compute.servers())
+
+    results = {}
+    for name, benchmark, takes_servers in BENCHMARKS:
+        if only and name not in only:
+            continue
+        args = (oi, cloud, server_list) if takes_servers else (oi, cloud)
+        times = []
+        items = requests = 0
+        error = None
+        for i in range(repeat):
+            served = sum(cloud.stats.values())
+            start = time.time()
+            try:
+                items = benchmark(*args)
+            except Exception as e:
+                error = repr(e)
+                break
+            times.append(time.time() - start)
+            requests = sum(cloud.stats.values()) - served
+
+        result = {'items': items, 'requests': requests, 'error': error,
+                  'best': None, 'median': None,
+                  'items_per_second': None, 'ms_per_request': None}
+        if times:
+            best = min(times)
+            result.update({
+                'best': best, 'median': _median(times),
+                'items_per_second': items / best if best else None,
+                'ms_per_request': (
+                    best * 1000 / requests if requests else None),
+            })
+        results[name] = result
+
+    if verbose:
+        print_results(results)
+    return results
+
+
+def _format(value, fmt):
+    if value is None:
+        return ''
+    return fmt % value
+
+
+def print_results(results, baseline=None):
+    """Print benchmark results, with the change against a baseline."""
+    headers = ['benchmark', 'items', 'requests', 'best (s)', 'median (s)',
+               'items/s', 'ms/request']
+    if baseline:
+        headers.append('change')
+    rows = []
+    for name, _, _ in BENCHMARKS:
+        if name not in results:
+            continue
+        result = results[name]
+        if result['error']:
+            row = [name, output.style_text(result['error'], ['red'])]
+            row += [''] * (len(headers) - len(row))
+            rows.append(row)
+            continue
+        row = [
+            name, result['items'], result['requests'],
+            _format(result['best'], '%.4f'),
+            _format(result['median'], '%.4f'),
+            _format(result['items_per_second'], '%.0f'),
+            _format(result['ms_per_request'], '%.3f'),
+        ]
+        if baseline:
+            row.append(
+                _format(_change(result, baseline.get(name)), '%+.1f%%'))
+        rows.append(row)
+    output.print_list_rows(rows, headers)
+
+
+def _change(result, baseline_result):
+    """Percent change in best time against the baseline."""
+    if not baseline_result or not baseline_result.get('best') or \
+            not result.get('best'):
+        return None
+    return (result['best'] / baseline_result['best'] - 1) * 100
+
+
+def regressions(results, baseline, tolerance=0.2):
+    """Names of benchmarks slower than the baseline by over tolerance."""
+    slower = []
+    for name, result in results.items():
+        change = _change(result, baseline.get(name))
+        if result['error'] or (change is not None and
+                               change > tolerance * 100):
+            slower.append(name)
+    return sorted(slower)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--regions', type=int, default=2)
+    parser.add_argument('--servers', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="Seconds each request takes.")
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help="Fraction of requests that fail.")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', nargs='+', metavar='BENCHMARK',
+                        choices=[name for name, _, _ in BENCHMARKS])
+    parser.add_argument('--save', metavar='PATH',
+                        help="Save the results as json.")
+    parser.add_argument('--compare', metavar='PATH',
+                        help="Compare against results saved with --save.")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Allowed slowdown against --compare, "
+                             "default 0.2 (20%%).")
+    args = parser.parse_args(argv)
+
+    results = run(
+        regions=args.regions, servers=args.servers, latency=args.latency,
+        error_rate=args.error_rate, repeat=args.repeat, only=args.only,
+        verbose=False)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_results(results, baseline)
+
+    if args.save:
+        with open(args.save, 'w') as results_file:
+            json.dump(results, results_file, indent=2, sort_keys=True)
+
+    if baseline:
+        slower = regressions(results, baseline, args.tolerance)
+        if slower:
+            output.print_styled(
+                "Regressions: %s" % ", ".join(slower), ['red', 'bold'])
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -105,7 +105,9 @@ class SetupOpenStackInterpreter(command.Command):
 
     def take_action(self, parsed_args):
         self._check_auth_url()
-        interpreter = OpenStackInterpreter(self) # noqa
+        interpreter = OpenStackInterpreter( # noqa
+            session=self.app.client_manager.session,
+            default_region=self.app.client_manager.region_name)
         oi = interpreter # noqa
         print(welcome_msg)
 
@@ -1,5 +1,10 @@
 
+from openstack_interpreter.common.memo import memoize
+from openstack_interpreter.common.rate_limit import RateLimiter
+from openstack_interpreter.common.session_hooks import wrap_request
 from openstack_interpreter.v1.clients import ClientManager
+from openstack_interpreter.v1.metering import MeteringHelper
+from openstack_interpreter.v1.orchestration import OrchestrationHelper
 from openstack_interpreter.v1.sdk import SDKManager
 
 
@@ -21,16 +26,61 @@ class OpenStackInterpreter(object):
       - sdk
           The interpreter SDKManager. A wrapper around the openstack sdk
           with some helper functions for setup.
+      - metering
+          Helpers for streaming and aggregating large amounts of
+          ceilometer samples.
+      - orchestration
+          Helpers for walking and inspecting large nested heat stacks.
+      - rate_limiter
+          Adaptive per service and region limits on concurrent requests,
+          with retries for throttled requests. To see the current limits:
+          In [1]: oi.rate_limiter.print_limits()
+
+    methods:
+      - memo
+          Memoize repeated GET requests within a block.
+          For help do:
+          In [1]: oi.memo?
 
     """
 
-    def __init__(self, command):
-        self.session = command.app.client_manager.session
+    def __init__(self, session, default_region):
+        self.session = session
+        self.rate_limiter = RateLimiter()
+        wrap_request(self.session, self.rate_limiter.request)
         self.clients = ClientManager(
             session=self.session,
-            default_region=command.app.client_manager.region_name,
+            default_region=default_region,
         )
         self.sdk = SDKManager(
             session=self.session,
-            default_region=command.app.client_manager.region_name,
+            default_region=default_region,
         )
+        self.metering = MeteringHelper(self.clients)
+        self.orchestration = OrchestrationHelper(self.clients)
+
+    def memo(self, ttl=60, maxsize=1024, verbose=True):
+        """Memoize repeated GET requests made within a block.
+
+        Identical GETs made via any client or the SDK are answered from
+        a short lived cache rather than the API, and identical GETs made
+        concurrently are coalesced into one. A summary of hit rates is
+        printed at the end of the block.
+
+        :param ttl: seconds a response is reused for, None for no expiry
+        :param maxsize: maximum number of responses kept
+        :param verbose: print the hit rate summary at the end of the block
+
+        examples:
+        In [1]: with oi.memo():
+           ...:     for server in oi.sdk.connection.compute.servers():
+           ...:         print(oi.sdk.connection.compute.get_flavor(
+           ...:             server.flavor_id).name)
+           ...:
+        In [2]: with oi.memo(ttl=10, verbose=False) as memo:
+           ...:     do_things()
+           ...:
+        In [3]: memo.hit_rate
+        """
+        return memoize(self.session, ttl=ttl, maxsize=maxsize,
+                       verbose=verbose)
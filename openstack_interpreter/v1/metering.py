@@ -0,0 +1,249 @@
+from collections import deque
+from datetime import datetime
+from datetime import timedelta
+from multiprocessing.pool import ThreadPool
+
+from openstack_interpreter.common import output
+
+
+DEFAULT_PERCENTILES = (50, 95)
+
+# ceilometer caps results at its own default (100) if we don't send a
+# limit, so always send one so we know when a window has been cut off.
+DEFAULT_LIMIT = 1000
+
+# don't split windows smaller than this when a window hits the limit
+MIN_WINDOW = timedelta(minutes=1)
+
+
+def _to_timedelta(window):
+    if isinstance(window, timedelta):
+        return window
+    return timedelta(seconds=window)
+
+
+def _time_windows(start, end, window):
+    """Split the time between start and end into (start, end) pairs."""
+    windows = []
+    while start < end:
+        windows.append((start, min(start + window, end)))
+        start += window
+    return windows
+
+
+def _bounded_imap(pool, func, items, size):
+    """Like pool.imap, but with at most size results waiting at a time.
+
+    pool.imap queues up every item at once, which means the results can
+    pile up in memory if they are being consumed slower than they are
+    being fetched.
+    """
+    pending = deque()
+    items = iter(items)
+    for item in items:
+        pending.append(pool.apply_async(func, (item, )))
+        if len(pending) >= size:
+            break
+    while pending:
+        result = pending.popleft().get()
+        for item in items:
+            pending.append(pool.apply_async(func, (item, )))
+            break
+        yield result
+
+
+class MeteringHelper(object):
+    """
+    Helper functions for pulling large amounts of data out of ceilometer.
+
+    Rather than asking ceilometer for a month of samples in one huge
+    request, these functions split the time range into windows, fetch
+    the windows concurrently, and stream the samples or aggregates back
+    to you one window at a time.
+
+    For the ceilometerclient itself see:
+    In [1]: oi.clients.metering?
+
+    Aggregation requires numpy to be installed.
+
+    methods:
+      - samples
+          Stream the samples for a meter, one time window at a time.
+          For help do:
+          In [1]: oi.metering.samples?
+      - aggregate
+          Stream per resource, per window aggregates for a meter.
+          For help do:
+          In [1]: oi.metering.aggregate?
+      - print_aggregate
+          Print the per resource, per window aggregates for a meter.
+          For help do:
+          In [1]: oi.metering.print_aggregate?
+    """
+
+    def __init__(self, clients):
+        self._clients = clients
+
+    def _list_samples(self, client, meter, window_start, window_end,
+                      query, limit):
+        q = list(query or []) + [
+            {'field': 'timestamp', 'op': 'ge',
+             'value': window_start.isoformat()},
+            {'field': 'timestamp', 'op': 'lt',
+             'value': window_end.isoformat()},
+        ]
+        samples = client.samples.list(meter_name=meter, q=q, limit=limit)
+        if len(samples) < limit:
+            return samples
+        if window_end - window_start <= MIN_WINDOW:
+            output.print_styled(
+                "WARNING: The window %s to %s returned the limit of %s "
+                "samples for '%s' and is too small to split further, so "
+                "some samples may be missing. Try a larger limit." % (
+                    window_start.isoformat(), window_end.isoformat(),
+                    limit, meter),
+                ['yellow'])
+            return samples
+        # we've likely been cut off by the limit, so split the
+        # window in half and try again.
+        middle = window_start + (window_end - window_start) // 2
+        return (
+            self._list_samples(
+                client, meter, window_start, middle, query, limit) +
+            self._list_samples(
+                client, meter, middle, window_end, query, limit))
+
+    def samples(self, meter, start, end=None, window=3600, query=None,
+                workers=4, limit=DEFAULT_LIMIT, region=None):
+        """Stream the samples for a meter, one time window at a time.
+
+        Yields (window_start, window_end, samples) in time order. At most
+        `workers` windows are being fetched or waiting to be consumed at
+        any one time.
+
+        :param meter: name of the meter, e.g. 'cpu_util'
+        :param start: datetime (UTC) to start from
+        :param end: datetime (UTC) to stop at, defaults to now
+        :param window: size of each window, as a timedelta or seconds
+        :param query: list of additional ceilometer query dicts, e.g.
+            [{'field': 'resource_id', 'op': 'eq', 'value': server.id}]
+        :param workers: number of windows to fetch concurrently
+        :param limit: max samples per request, defaults to 1000. A window
+            that hits this is split in half and fetched again, down to
+            windows of a minute.
+        :param region: region to query, defaults to your current region
+
+        examples:
+        In [1]: for start, end, samples in oi.metering.samples(
+                        'cpu_util', datetime(2018, 1, 1)):
+                    print(start, len(samples))
+        """
+        window = _to_timedelta(window)
+        if window <= timedelta(0):
+            raise ValueError("window must be positive.")
+        if workers < 1:
+            raise ValueError("workers must be at least 1.")
+        end = end or datetime.utcnow()
+        limit = limit or DEFAULT_LIMIT
+        windows = _time_windows(start, end, window)
+        client = self._clients.get_client('metering', region=region)
+
+        def fetch(time_window):
+            window_start, window_end = time_window
+            return (window_start, window_end, self._list_samples(
+                client, meter, window_start, window_end, query, limit))
+
+        pool = ThreadPool(workers)
+        try:
+            for result in _bounded_imap(pool, fetch, windows, workers):
+                yield result
+        finally:
+            pool.terminate()
+
+    def aggregate(self, meter, start, end=None, window=3600, query=None,
+                  percentiles=DEFAULT_PERCENTILES, workers=4,
+                  limit=DEFAULT_LIMIT, region=None):
+        """Stream per resource, per window aggregates for a meter.
+
+        Only one window of samples is held in memory at a time, so this
+        is suitable for reports over long periods.
+
+        Yields a dict per resource per window, in time order, with the
+        fields: resource_id, window_start, window_end, count, sum, avg,
+        min, max, and p<N> for each of the requested percentiles.
+
+        Takes the same arguments as oi.metering.samples plus:
+        :param percentiles: percentiles to calculate, defaults to (50, 95)
+
+        examples:
+        In [1]: rows = list(oi.metering.aggregate(
+                    'cpu_util', datetime(2018, 1, 1), window=86400))
+        In [2]: output.export(
+                    oi.metering.aggregate(
+                        'cpu_util', datetime(2018, 1, 1), window=86400),
+                    ['resource_id', 'window_start', 'avg', 'p95'],
+                    'cpu_util.csv')
+        """
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("Aggregation requires numpy to be installed.")
+
+        for window_start, window_end, samples in self.samples(
+                meter, start, end=end, window=window, query=query,
+                workers=workers, limit=limit, region=region):
+            if not samples:
+                continue
+            resources, inverse = numpy.unique(
+                [s.resource_id for s in samples], return_inverse=True)
+            volumes = numpy.array(
+                [s.counter_volume for s in samples], dtype=float)
+
+            counts = numpy.bincount(inverse, minlength=len(resources))
+            sums = numpy.bincount(
+                inverse, weights=volumes, minlength=len(resources))
+
+            # sort by resource then volume so each resource's volumes are
+            # a contiguous, sorted slice.
+            order = numpy.lexsort((volumes, inverse))
+            sorted_volumes = volumes[order]
+            offsets = numpy.concatenate(([0], numpy.cumsum(counts)))
+
+            for i, resource_id in enumerate(resources):
+                resource_volumes = sorted_volumes[offsets[i]:offsets[i + 1]]
+                row = {
+                    'resource_id': str(resource_id),
+                    'window_start': window_start.isoformat(),
+                    'window_end': window_end.isoformat(),
+                    'count': int(counts[i]),
+                    'sum': float(sums[i]),
+                    'avg': float(sums[i] / counts[i]),
+                    'min': float(resource_volumes[0]),
+                    'max': float(resource_volumes[-1]),
+                }
+                if percentiles:
+                    values = numpy.percentile(resource_volumes, percentiles)
+                    for percentile, value in zip(percentiles, values):
+                        row['p%s' % percentile] = float(value)
+                yield row
+
+    def print_aggregate(self, meter, start, end=None, window=3600,
+                        query=None, percentiles=DEFAULT_PERCENTILES,
+                        workers=4, limit=DEFAULT_LIMIT, region=None):
+        """Print per resource, per window aggregates for a meter.
+
+        Takes the same arguments as oi.metering.aggregate.
+
+        examples:
+        In [1]: oi.metering.print_aggregate(
+                    'cpu_util', datetime.utcnow() - timedelta(days=1))
+        """
+        fields = ['resource_id', 'window_start', 'window_end', 'count',
+                  'sum', 'avg', 'min', 'max']
+        fields += ['p%s' % percentile for percentile in percentiles or []]
+        output.print_list(
+            self.aggregate(
+                meter, start, end=end, window=window, query=query,
+                percentiles=percentiles, workers=workers, limit=limit,
+                region=region),
+            fields)
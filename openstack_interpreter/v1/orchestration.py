@@ -0,0 +1,219 @@
+from datetime import datetime
+from multiprocessing.pool import ThreadPool
+
+from openstack_interpreter.common import output
+
+
+HEAT_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+STACK_TREE_FIELDS = [
+    'resource_name', 'resource_type', 'resource_status', 'duration',
+    'updated_time', 'resource_status_reason']
+
+
+def _parse_time(heat_time):
+    if not heat_time:
+        return None
+    return datetime.strptime(heat_time.rstrip('Z')[:19], HEAT_TIME_FORMAT)
+
+
+def _nested_stack(resource):
+    """Get the 'name/id' of a resource's nested stack if it has one."""
+    for link in getattr(resource, 'links', None) or []:
+        if link.get('rel') == 'nested':
+            return '/'.join(link['href'].rstrip('/').split('/')[-2:])
+    return None
+
+
+def _status_formatter(status):
+    status = status or ''
+    if status.endswith('FAILED'):
+        return output.style_text(status, ['red', 'bold'])
+    if status.endswith('IN_PROGRESS'):
+        return output.style_text(status, ['yellow'])
+    if status.endswith('COMPLETE'):
+        return output.style_text(status, ['green'])
+    return status
+
+
+def _failed(row):
+    return (row.get('resource_status') or '').endswith('FAILED')
+
+
+def _failed_rows(rows):
+    """Get the FAILED rows, and the rows of the stacks they're nested in.
+    """
+    owners = dict(
+        (row['nested_stack'], row) for row in rows if row['nested_stack'])
+    keep = set()
+    for row in rows:
+        if not _failed(row):
+            continue
+        while row is not None and id(row) not in keep:
+            keep.add(id(row))
+            row = owners.get(row['stack'])
+    return [row for row in rows if id(row) in keep]
+
+
+class OrchestrationHelper(object):
+    """
+    Helper functions for inspecting large heat stacks.
+
+    Nested stacks are walked breadth first, with all the stacks at a
+    given depth having their resources fetched concurrently. The
+    resources of each stack are cached, so walking the same stack again
+    is fast. Clear the cache to see new changes:
+    In [1]: oi.orchestration.clear_cache()
+
+    For the heatclient itself see:
+    In [1]: oi.clients.orchestration?
+
+    methods:
+      - walk_stack
+          Get every resource in a stack and its nested stacks.
+          For help do:
+          In [1]: oi.orchestration.walk_stack?
+      - print_stack_tree
+          Print every resource in a stack and its nested stacks.
+          For help do:
+          In [1]: oi.orchestration.print_stack_tree?
+    """
+
+    def __init__(self, clients):
+        self._clients = clients
+        self._resources = {}
+
+    def clear_cache(self):
+        self._resources = {}
+
+    def _list_resources(self, client, region, stack):
+        key = (region, stack)
+        if key not in self._resources:
+            self._resources[key] = client.resources.list(stack)
+        return self._resources[key]
+
+    def walk_stack(self, stack, max_depth=None, workers=8, region=None):
+        """Get every resource in a stack and its nested stacks.
+
+        Returns a list of dicts in tree order, with each nested stack's
+        resources following the resource that owns them. Each dict has
+        the fields of the heat resource, plus:
+          - stack: 'name/id' of the stack the resource is in
+          - depth: how deeply nested that stack is, 0 being the top
+          - nested_stack: 'name/id' of the resource's nested stack
+          - duration: time between the creation and last update
+
+        If the resources of a nested stack can't be listed, for instance
+        as it has been deleted, the walk carries on and the stack gets a
+        single row with a resource_status of LIST_FAILED and the error as
+        its resource_status_reason.
+
+        :param stack: name or id of the top level stack
+        :param max_depth: how many levels of nested stacks to walk,
+            defaults to all of them
+        :param workers: number of stacks to fetch resources for at once
+        :param region: region of the stack, defaults to your current region
+
+        examples:
+        In [1]: resources = oi.orchestration.walk_stack('my-stack')
+        In [2]: failed = [r for r in resources
+                          if r['resource_status'] == 'CREATE_FAILED']
+        """
+        client = self._clients.get_client('orchestration', region=region)
+        # the top level stack is fetched on its own, so if it can't be
+        # listed that error is raised as is.
+        children = {stack: self._list_resources(client, region, stack)}
+        errors = {}
+
+        def fetch(stack):
+            try:
+                return stack, self._list_resources(client, region, stack), None
+            except Exception as e:
+                return stack, [], e
+
+        pool = ThreadPool(workers)
+        try:
+            frontier = [stack]
+            depth = 0
+            while frontier:
+                next_frontier = []
+                for parent, resources, error in pool.map(fetch, frontier):
+                    children[parent] = resources
+                    if error is not None:
+                        errors[parent] = error
+                    if max_depth is not None and depth >= max_depth:
+                        continue
+                    for resource in resources:
+                        nested = _nested_stack(resource)
+                        if nested and nested not in children:
+                            next_frontier.append(nested)
+                frontier = next_frontier
+                depth += 1
+        finally:
+            pool.terminate()
+
+        rows = []
+
+        def add_rows(parent, depth):
+            if parent in errors:
+                rows.append({
+                    'resource_name': '', 'resource_type': '',
+                    'resource_status': 'LIST_FAILED',
+                    'resource_status_reason': str(errors[parent]),
+                    'updated_time': '', 'stack': parent, 'depth': depth,
+                    'nested_stack': None, 'duration': ''})
+            for resource in sorted(
+                    children[parent], key=lambda r: r.resource_name):
+                row = resource.to_dict()
+                created = _parse_time(row.get('creation_time'))
+                updated = _parse_time(row.get('updated_time'))
+                row['stack'] = parent
+                row['depth'] = depth
+                row['nested_stack'] = _nested_stack(resource)
+                row['duration'] = ''
+                if created and updated:
+                    row['duration'] = str(updated - created)
+                rows.append(row)
+                if row['nested_stack'] in children:
+                    add_rows(row['nested_stack'], depth + 1)
+
+        add_rows(stack, 0)
+        return rows
+
+    def print_stack_tree(self, stack, max_depth=None, workers=8,
+                         region=None, failed_only=False,
+                         fields=STACK_TREE_FIELDS):
+        """Print every resource in a stack and its nested stacks.
+
+        Resources are indented by how deeply nested their stack is. With
+        failed_only, the resources that own the nested stacks a failed
+        resource is in are also printed, so you can see where it is.
+
+        Takes the same arguments as oi.orchestration.walk_stack plus:
+        :param failed_only: only print resources in a FAILED state, and
+            the resources they are nested under
+        :param fields: fields to print for each resource
+
+        examples:
+        In [1]: oi.orchestration.print_stack_tree('my-stack')
+        In [2]: oi.orchestration.print_stack_tree(
+                    'my-stack', failed_only=True, max_depth=2)
+        """
+        start = datetime.utcnow()
+        rows = self.walk_stack(
+            stack, max_depth=max_depth, workers=workers, region=region)
+        took = datetime.utcnow() - start
+
+        stacks = len(set(row['stack'] for row in rows))
+        if failed_only:
+            rows = _failed_rows(rows)
+        for row in rows:
+            row['resource_name'] = (
+                '  ' * row['depth'] + row['resource_name'])
+
+        output.print_list(
+            rows, fields, formatters={
+                'resource_status': _status_formatter,
+                'resource_status_reason': output.text_wrap_formatter})
+        print("%s resources in %s stacks took: %s" % (
+            len(rows), stacks, took))